@@ -4,10 +4,9 @@ Example usage script for the Cross-Platform Traceroute Tool.
 This script demonstrates various ways to use the traceroute tool.
 """
 
-import subprocess
-import json
 import os
-import sys
+
+from traceroute import run_and_save
 
 def run_example(target, description):
     """Run a traceroute example and display results"""
@@ -17,44 +16,36 @@ def run_example(target, description):
     print(f"{'='*60}")
     
     output_file = f"example_{target.replace('.', '_').replace(':', '_')}"
-    cmd = [sys.executable, "traceroute.py", "-t", target, "-n", "2", "-m", "5", "-o", output_file]
     
     try:
         print("Running traceroute...")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        # Runs in-process, so the interpreter and the cached command lookup are shared
+        data = run_and_save(target, 2, 1, 5, output_file)
         
-        if result.returncode == 0:
+        if data is not None:
             print("✅ Traceroute completed successfully!")
             
-            # Load and display results
-            if os.path.exists(f"{output_file}.json"):
-                with open(f"{output_file}.json", "r") as f:
-                    data = json.load(f)
-                
-                print(f"\nResults Summary:")
-                print(f"- Total hops: {len(data)}")
-                
-                for hop in data[:3]:  # Show first 3 hops
-                    print(f"  Hop {hop['hop']}: {hop['hosts'][0] if hop['hosts'] else 'No response'}")
-                    print(f"    Latency: {hop['min']:.1f}ms - {hop['max']:.1f}ms (avg: {hop['avg']:.1f}ms)")
-                
-                if len(data) > 3:
-                    print(f"  ... and {len(data) - 3} more hops")
-                
-                # Clean up
-                os.remove(f"{output_file}.json")
-                if os.path.exists(f"traceroute_outputs/{output_file}_run_1.txt"):
-                    os.remove(f"traceroute_outputs/{output_file}_run_1.txt")
-                if os.path.exists(f"traceroute_outputs/{output_file}_run_2.txt"):
-                    os.remove(f"traceroute_outputs/{output_file}_run_2.txt")
-                
-            else:
-                print("❌ Output file not found")
+            print(f"\nResults Summary:")
+            print(f"- Total hops: {len(data)}")
+            
+            for hop in data[:3]:  # Show first 3 hops
+                print(f"  Hop {hop['hop']}: {hop['hosts'][0] if hop['hosts'] else 'No response'}")
+                print(f"    Latency: {hop['min']:.1f}ms - {hop['max']:.1f}ms (avg: {hop['avg']:.1f}ms)")
+            
+            if len(data) > 3:
+                print(f"  ... and {len(data) - 3} more hops")
+            
+            # Clean up (run_and_save writes traceroute_run_N.txt into traceroute_outputs)
+            for path in (f"{output_file}.json",
+                         "traceroute_outputs/traceroute_run_1.txt",
+                         "traceroute_outputs/traceroute_run_2.txt"):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
         else:
-            print(f"❌ Traceroute failed: {result.stderr}")
+            print("❌ Traceroute failed: no hop data collected")
     
-    except subprocess.TimeoutExpired:
-        print("⏰ Traceroute timed out")
     except Exception as e:
         print(f"❌ Error: {e}")
 
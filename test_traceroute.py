@@ -10,6 +10,28 @@ import os
 import sys
 import platform
 
+from traceroute import (
+    feed_tracert_line, feed_traceroute_line, new_hop_data,
+    parse_tracert_output, parse_traceroute_output
+)
+
+# Sample outputs exercising sub-millisecond, partial and fully timed out hops
+TRACERT_SAMPLE = (
+    "Tracing route to 10.1.1.1 over a maximum of 30 hops\n"
+    "\n"
+    "  1    <1 ms    <1 ms    <1 ms  router.home.local [192.168.1.1]\n"
+    "  2     *        *        *     Request timed out.\n"
+    "  4    10 ms     *       12 ms  10.1.1.1\n"
+    "\n"
+    "Trace complete.\n"
+)
+TRACEROUTE_SAMPLE = (
+    "traceroute to 10.0.0.9 (10.0.0.9), 30 hops max, 60 byte packets\n"
+    " 3  10.0.0.1 (10.0.0.1)  5.0 ms * 4.0 ms\n"
+    " 5  * c.example (10.0.0.4)  9.0 ms  9.5 ms\n"
+    " 6  d (10.0.0.5)  3.0 ms !H  3.1 ms !H  3.2 ms !H\n"
+)
+
 def test_basic_functionality():
     """Test basic traceroute functionality"""
     print("=" * 60)
@@ -64,10 +86,11 @@ def test_platform_detection():
             print("⚠️  Platform detection unclear")
         
         # Clean up
-        if os.path.exists("test_platform.json"):
-            os.remove("test_platform.json")
-        if os.path.exists("traceroute_outputs/test_platform_run_1.txt"):
-            os.remove("traceroute_outputs/test_platform_run_1.txt")
+        for path in ("test_platform.json", "traceroute_outputs/test_platform_run_1.txt"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
             
         return True
     except Exception as e:
@@ -152,6 +175,78 @@ def test_help():
         print(f"❌ Help test error: {e}")
         return False
 
+def test_tracert_parsing():
+    """Test Windows tracert parsing of sub-millisecond, partial and timed out hops"""
+    print("\n" + "=" * 60)
+    print("TESTING TRACERT PARSING")
+    print("=" * 60)
+    
+    expected = {
+        1: {'hosts': ["router.home.local [192.168.1.1]"], 'latencies': [1.0, 1.0, 1.0]},
+        2: {'hosts': ["*"], 'latencies': []},
+        4: {'hosts': ["10.1.1.1"], 'latencies': [10.0, 12.0]},
+    }
+    
+    try:
+        hop_data = dict(parse_tracert_output(TRACERT_SAMPLE))
+        if hop_data == expected:
+            print("✅ Tracert parsing PASSED")
+            return True
+        else:
+            print(f"❌ Tracert parsing FAILED: got {hop_data}, expected {expected}")
+            return False
+    except Exception as e:
+        print(f"❌ Tracert parsing test error: {e}")
+        return False
+
+def test_traceroute_parsing():
+    """Test Unix traceroute parsing of timeouts, annotations and late responders"""
+    print("\n" + "=" * 60)
+    print("TESTING TRACEROUTE PARSING")
+    print("=" * 60)
+    
+    expected = {3: [5.0, 4.0], 5: [9.0, 9.5], 6: [3.0, 3.1, 3.2]}
+    
+    try:
+        hop_data = parse_traceroute_output(TRACEROUTE_SAMPLE)
+        latencies = {hop: data['latencies'] for hop, data in hop_data.items()}
+        if latencies == expected:
+            print("✅ Traceroute parsing PASSED")
+            return True
+        else:
+            print(f"❌ Traceroute parsing FAILED: got {latencies}, expected {expected}")
+            return False
+    except Exception as e:
+        print(f"❌ Traceroute parsing test error: {e}")
+        return False
+
+def test_streaming_matches_batch():
+    """Test that per-line streaming and whole-output parsing give the same hop data"""
+    print("\n" + "=" * 60)
+    print("TESTING STREAMING VS BATCH PARSING")
+    print("=" * 60)
+    
+    checks = [
+        ("tracert", TRACERT_SAMPLE, feed_tracert_line, parse_tracert_output),
+        ("traceroute", TRACEROUTE_SAMPLE, feed_traceroute_line, parse_traceroute_output),
+    ]
+    
+    try:
+        for name, output, feed_line, parse_output in checks:
+            # Lines keep their newline, as they do when read from a live process
+            streamed = new_hop_data()
+            for line in output.splitlines(keepends=True):
+                feed_line(streamed, line)
+            parsed = parse_output(output)
+            if streamed != parsed:
+                print(f"❌ Streaming vs batch {name} parsing FAILED: {dict(streamed)} != {dict(parsed)}")
+                return False
+        print("✅ Streaming vs batch parsing PASSED")
+        return True
+    except Exception as e:
+        print(f"❌ Streaming vs batch parsing test error: {e}")
+        return False
+
 def cleanup_test_files():
     """Clean up test files"""
     print("\n" + "=" * 60)
@@ -166,9 +261,11 @@ def cleanup_test_files():
     ]
     
     for file in test_files:
-        if os.path.exists(file):
-            os.remove(file)
-            print(f"✅ Removed {file}")
+        try:
+            os.unlink(file)
+        except FileNotFoundError:
+            continue
+        print(f"✅ Removed {file}")
     
     # Clean up traceroute output files
     for file in os.listdir("traceroute_outputs"):
@@ -187,7 +284,10 @@ def main():
         test_platform_detection,
         test_basic_functionality,
         test_file_mode,
-        test_error_handling
+        test_error_handling,
+        test_tracert_parsing,
+        test_traceroute_parsing,
+        test_streaming_matches_batch
     ]
     
     passed = 0
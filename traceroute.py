@@ -1,18 +1,42 @@
 import argparse
+import asyncio
 import subprocess
 import json
 import os
-import statistics
+import math
 import re
-import time
+import locale
 import platform
 import shutil
+from collections import defaultdict
+from functools import lru_cache
 
+# orjson is optional; fall back to the standard library when it is missing
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, indent=4).encode("utf-8")
+
+# numpy is optional; it only takes over statistics for hops with many samples
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many samples per hop, NumPy's call overhead outweighs its speed
+_NUMPY_MIN_SAMPLES = 32
+
+# The platform cannot change while the process runs, so look it up once
+_SYSTEM = platform.system().lower()
+
+@lru_cache(maxsize=1)
 def detect_traceroute_command():
-    """Detect available traceroute command based on platform"""
-    system = platform.system().lower()
-    
-    if system == "windows":
+    """Detect available traceroute command based on platform (cached after the first PATH scan)"""
+    if _SYSTEM == "windows":
         # Try tracert.exe first (Windows native)
         if shutil.which("tracert"):
             return "tracert", "windows"
@@ -37,217 +61,337 @@ def build_traceroute_command(command, target, max_hops, platform_type):
         # Unix traceroute uses -m for max hops
         return [command, "-m", str(max_hops), target]
 
-def parse_tracert_output(output):
-    """Parse Windows tracert output format"""
-    hop_data = {}
-    
-    for line in output.split("\n"):
-        # Windows tracert format examples:
-        # "  1    <1 ms    <1 ms    <1 ms  router.home.local [192.168.1.1]"
-        # "  2     *        *        *     Request timed out."
-        # "  3     5 ms     4 ms     6 ms  gateway.example.com [10.0.0.1]"
-        # IPv6: "  1     3 ms     2 ms     3 ms  router.example.com [2610:130:110:1505::253]"
-        
-        # Pattern to match hop number and extract data
-        hop_match = re.match(r'^\s*(\d+)\s+', line)
-        if hop_match:
-            hop = int(hop_match.group(1))
-            
-            # Extract latencies (handles both regular numbers and <1 format)
-            latency_pattern = r'(\d+|\<\d+)\s*ms'
-            latencies = []
-            for match in re.finditer(latency_pattern, line):
-                lat_str = match.group(1)
-                if lat_str.startswith('<'):
-                    latencies.append(float(lat_str[1:]))
-                else:
-                    latencies.append(float(lat_str))
-            
-            # Extract hostname and IP (support both IPv4 and IPv6)
-            hostname = ""
-            ip = ""
-            
-            # Extract hostname and IP from the end of the line
-            # Windows tracert format: "  1     2 ms     2 ms     6 ms  hostname [ip]"
-            
-            # Find all text after the last latency measurement
-            # Use a more precise pattern that looks for the complete latency section
-            pattern = r'^\s*\d+\s+(?:(?:\d+|\<\d+|\*)\s*ms\s*){1,3}\s*(.*)$'
-            match = re.match(pattern, line)
-            if match:
-                remaining_text = match.group(1).strip()
-                
-                if remaining_text:
-                    # Pattern: hostname [IP]
-                    host_ip_match = re.search(r'^(.+?)\s+\[([^\]]+)\]$', remaining_text)
-                    if host_ip_match:
-                        hostname = host_ip_match.group(1).strip()
-                        ip = host_ip_match.group(2).strip()
-                    else:
-                        # Pattern: just [IP]
-                        ip_only_match = re.search(r'^\[([^\]]+)\]$', remaining_text)
-                        if ip_only_match:
-                            ip = ip_only_match.group(1).strip()
-                        else:
-                            # Pattern: just hostname (no IP in brackets)
-                            hostname = remaining_text
-            
-            # Check for timeout
-            if "*" in line or "Request timed out" in line:
-                latencies = []  # No valid latencies for timeout
-            
-            # Build host entry
-            if hostname and ip:
-                host_entry = [f"{hostname} [{ip}]"]
-            elif hostname:
-                host_entry = [hostname]
-            elif ip:
-                host_entry = [f"[{ip}]"]
-            else:
-                host_entry = ["*"]
-            
-            if hop not in hop_data:
-                hop_data[hop] = {'hosts': set(), 'latencies': []}
-            hop_data[hop]['hosts'].update(host_entry)
-            hop_data[hop]['latencies'].extend(latencies)
-    
-    return hop_data
+# Windows tracert hop line: hop number, three latency slots and the trailing host/IP
+# Hop patterns are MULTILINE and use [ \t] rather than \s, so the same pattern
+# matches a single streamed line or scans a whole output without crossing lines
+_TRACERT_RE = re.compile(
+    r'(?m)^[ \t]*(\d+)[ \t]+(<?\d+|\*)(?:[ \t]*ms)?[ \t]+(<?\d+|\*)(?:[ \t]*ms)?[ \t]+(<?\d+|\*)(?:[ \t]*ms)?[ \t]*(.*)$'
+)
+# Trailing tracert field: "hostname [ip]", "[ip]" or a bare hostname/IP
+_HOST_RE = re.compile(r'^(?:(.+?)\s+\[([^\]]+)\]|\[([^\]]+)\]|(.+?))?\s*$')
+# Unix traceroute hop line: hop number, optional hostname and IP, then latencies or timeouts
+_TRACEROUTE_RE = re.compile(
+    r"(?m)^[ \t]*(\d+)[ \t]+([a-zA-Z0-9.-]+)?(?: \((\d+\.\d+\.\d+\.\d+)\))?((?:[ \t]+\d+\.\d+ ms|[ \t]*\*+).*)"
+)
+# Latency values in the rest of a hop line captured by _TRACEROUTE_RE, which can
+# hold timeouts ("*"), annotations ("!H") and further responders between them
+_LATENCY_RE = re.compile(r"\d+\.\d+(?= ms)")
 
-def run_traceroute(target, num_runs, run_delay, max_hops, output_dir):
-    """Run traceroute with platform detection"""
+# Hop lines start with their hop number; anything else is a banner or blank line
+_DIGITS = frozenset("0123456789")
+
+def new_hop_data():
+    """Create an empty hop accumulator, keyed by hop number"""
+    return defaultdict(lambda: {'hosts': [], 'latencies': []})
+
+def _tracert_latency(value):
+    """Convert a tracert latency slot ("5" or "<1") to milliseconds"""
+    if value[0] == '<':
+        return float(value[1:])
+    return float(value)
+
+def _record_tracert_hop(hop_data, match):
+    """Add one _TRACERT_RE hop match to hop_data"""
+    # Windows tracert format examples:
+    # "  1    <1 ms    <1 ms    <1 ms  router.home.local [192.168.1.1]"
+    # "  2     *        *        *     Request timed out."
+    # "  3     5 ms     4 ms     6 ms  gateway.example.com [10.0.0.1]"
+    # IPv6: "  1     3 ms     2 ms     3 ms  router.example.com [2610:130:110:1505::253]"
+    hop = int(match.group(1))
+    slots = match.group(2, 3, 4)
     
-    # Detect available traceroute command
-    command, platform_type = detect_traceroute_command()
-    if not command:
-        print("Error: No traceroute command found.")
-        print("On Windows: tracert.exe should be available by default")
-        print("On Linux/Unix: install traceroute package")
-        return []
+    # Timed out probes ("*") simply contribute no latency
+    latencies = [_tracert_latency(value) for value in slots if value != '*']
     
-    print(f"Using {command} command ({platform_type} format)")
+    # Extract hostname and IP (support both IPv4 and IPv6)
+    hostname = ""
+    ip = ""
     
-    os.makedirs(output_dir, exist_ok=True)
-    traceroute_outputs = []
+    # A line where every probe timed out carries a message, not a host
+    if slots != ('*', '*', '*'):
+        host_match = _HOST_RE.match(match.group(5).strip())
+        if host_match.group(2):
+            # Pattern: hostname [IP]
+            hostname = host_match.group(1).strip()
+            ip = host_match.group(2).strip()
+        elif host_match.group(3):
+            # Pattern: just [IP]
+            ip = host_match.group(3).strip()
+        elif host_match.group(4):
+            # Pattern: just hostname (no IP in brackets)
+            hostname = host_match.group(4)
     
-    for i in range(num_runs):
+    # Build host entry
+    if hostname and ip:
+        host_entry = [f"{hostname} [{ip}]"]
+    elif hostname:
+        host_entry = [hostname]
+    elif ip:
+        host_entry = [f"[{ip}]"]
+    else:
+        host_entry = ["*"]
+    
+    # A hop rarely sees more than one or two hosts, so a list beats a set here
+    hosts = hop_data[hop]['hosts']
+    for host in host_entry:
+        if host not in hosts:
+            hosts.append(host)
+    hop_data[hop]['latencies'].extend(latencies)
+
+def feed_tracert_line(hop_data, line):
+    """Parse one line of Windows tracert output into hop_data"""
+    stripped = line.lstrip()
+    if not stripped or stripped[0] not in _DIGITS:
+        return
+    match = _TRACERT_RE.match(line)
+    if match:
+        _record_tracert_hop(hop_data, match)
+
+def parse_tracert_output(output, hop_data=None):
+    """Parse Windows tracert output format, accumulating into hop_data if given"""
+    hop_data = hop_data if hop_data is not None else new_hop_data()
+    # One regex walk over the whole output instead of a Python loop per line
+    for match in _TRACERT_RE.finditer(output):
+        _record_tracert_hop(hop_data, match)
+    return hop_data
+
+async def _run_one(i, cmd, feed_line, hop_data, run_delay, output_dir, semaphore):
+    """Run a single traceroute, streaming its output into hop_data"""
+    # Stagger start times so consecutive runs keep the requested delay
+    await asyncio.sleep(i * run_delay)
+    async with semaphore:
+        proc = None
         try:
-            # Build command based on platform
-            cmd = build_traceroute_command(command, target, max_hops, platform_type)
-            
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, text=True, check=True, timeout=300
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
             )
-            print(f"Raw Traceroute Output (Run {i+1}):")
-            print(result.stdout)
-            traceroute_outputs.append(result.stdout)
+            encoding = locale.getpreferredencoding(False)
+            # stderr is drained alongside stdout so a full stderr pipe cannot stall the run
+            stderr_reader = asyncio.ensure_future(proc.stderr.read())
             
-            with open(os.path.join(output_dir, f"traceroute_run_{i+1}.txt"), "w", encoding="utf-8") as f:
-                f.write(result.stdout)
-                
-            # Add delay between runs if specified
-            if run_delay > 0 and i < num_runs - 1:
-                print(f"Waiting {run_delay} seconds before next run...")
-                time.sleep(run_delay)
+            async def stream():
+                # Each hop line is parsed and saved as soon as traceroute prints it
+                # A 64 KiB buffer turns one write per line into one per 64 KiB
+                with open(os.path.join(output_dir, f"traceroute_run_{i+1}.txt"), "wb", buffering=1 << 16) as f:
+                    async for raw in proc.stdout:
+                        line = raw.decode(encoding, errors="replace").replace("\r\n", "\n")
+                        print(f"[Run {i+1}] {line}", end="")
+                        f.write(line.encode("utf-8"))
+                        feed_line(hop_data, line)
+                await proc.wait()
+            
+            try:
+                # The limit covers the streaming read itself, so a hung traceroute
+                # that never closes stdout is still cut off
+                await asyncio.wait_for(stream(), 300)
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(cmd, 300)
+            stderr = (await stderr_reader).decode(encoding, errors="replace")
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
                 
         except subprocess.TimeoutExpired:
             print(f"Warning: Traceroute run {i+1} timed out after 300 seconds")
-            continue
         except FileNotFoundError:
-            print(f"Error: {command} command not found. Ensure it is installed on your system.")
-            return []
+            raise
         except subprocess.CalledProcessError as e:
             print(f"Error in traceroute run {i+1}: {e}")
             if e.stderr:
                 print(f"Error output: {e.stderr}")
-            continue
         except Exception as e:
             print(f"Unexpected error in traceroute run {i+1}: {e}")
-            continue
+        finally:
+            # Never leave a traceroute running, whatever ended this run
+            if proc is not None and proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+def run_traceroute(target, num_runs, run_delay, max_hops, output_dir):
+    """Run traceroute with platform detection, running all runs concurrently"""
+    
+    # Detect available traceroute command
+    command, platform_type = detect_traceroute_command()
+    if not command:
+        print("Error: No traceroute command found.")
+        print("On Windows: tracert.exe should be available by default")
+        print("On Linux/Unix: install traceroute package")
+        return {}
+    
+    print(f"Using {command} command ({platform_type} format)")
+    feed_line = feed_tracert_line if platform_type == "windows" else feed_traceroute_line
+    
+    os.makedirs(output_dir, exist_ok=True)
+    hop_data = new_hop_data()
+    
+    # Build command based on platform
+    cmd = build_traceroute_command(command, target, max_hops, platform_type)
+    
+    async def run_all():
+        semaphore = asyncio.Semaphore(min(num_runs, 8))
+        tasks = [
+            _run_one(i, cmd, feed_line, hop_data, run_delay, output_dir, semaphore)
+            for i in range(num_runs)
+        ]
+        await asyncio.gather(*tasks)
+    
+    try:
+        asyncio.run(run_all())
+    except FileNotFoundError:
+        print(f"Error: {command} command not found. Ensure it is installed on your system.")
+        return {}
     
-    return traceroute_outputs
+    return hop_data
 
-def parse_traceroute_output(output):
+def _record_traceroute_hop(hop_data, match):
+    """Add one _TRACEROUTE_RE hop match to hop_data"""
+    hop = int(match.group(1))
+    hostname = match.group(2) or ""
+    ip = match.group(3) or ""
     
-    hop_data = {}
-    for line in output.split("\n"):
-        # More robust pattern that handles various traceroute formats
-        match = re.findall(r"^\s*(\d+)\s+([a-zA-Z0-9.-]+)?(?: \((\d+\.\d+\.\d+\.\d+)\))?((?:\s+\d+\.\d+ ms)+|\s*\*|\s+\*+)", line)
-        if match:
-            for hop_match in match:
-                hop = int(hop_match[0])
-                hostname = hop_match[1] if hop_match[1] else ""
-                ip = hop_match[2] if hop_match[2] else ""
-                
-                # Better host entry construction
-                if hostname and ip:
-                    host_entry = [f"{hostname} ({ip})"]
-                elif hostname:
-                    host_entry = [hostname]
-                elif ip:
-                    host_entry = [f"({ip})"]
-                else:
-                    host_entry = ["*"]
-                
-                # Extract latencies more robustly
-                latencies = [float(x) for x in re.findall(r"(\d+\.\d+) ms", line)]
-                
-                if hop not in hop_data:
-                    hop_data[hop] = {'hosts': set(), 'latencies': []}
-                hop_data[hop]['hosts'].update(host_entry)
-                hop_data[hop]['latencies'].extend(latencies)
-    print("Parsed Hop Data:", hop_data)  # Debugging print statement
+    # Better host entry construction
+    if hostname and ip:
+        host_entry = [f"{hostname} ({ip})"]
+    elif hostname:
+        host_entry = [hostname]
+    elif ip:
+        host_entry = [f"({ip})"]
+    else:
+        host_entry = ["*"]
+    
+    # Latencies come from the already matched rest of the line, not a rescan of it
+    latencies = list(map(float, _LATENCY_RE.findall(match.group(4))))
+    
+    # A hop rarely sees more than one or two hosts, so a list beats a set here
+    hosts = hop_data[hop]['hosts']
+    for host in host_entry:
+        if host not in hosts:
+            hosts.append(host)
+    hop_data[hop]['latencies'].extend(latencies)
+
+def feed_traceroute_line(hop_data, line):
+    """Parse one line of Unix traceroute output into hop_data"""
+    stripped = line.lstrip()
+    if not stripped or stripped[0] not in _DIGITS:
+        return
+    # More robust pattern that handles various traceroute formats
+    match = _TRACEROUTE_RE.match(line)
+    if match:
+        _record_traceroute_hop(hop_data, match)
+
+def parse_traceroute_output(output, hop_data=None):
+    """Parse Unix traceroute output format, accumulating into hop_data if given"""
+    hop_data = hop_data if hop_data is not None else new_hop_data()
+    # One regex walk over the whole output instead of a Python loop per line
+    for match in _TRACEROUTE_RE.finditer(output):
+        _record_traceroute_hop(hop_data, match)
     return hop_data
 
+def _median(values):
+    """Median of a non-empty list of latencies"""
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return 0.5 * (ordered[mid - 1] + ordered[mid])
+
+def _stdev(values, mean):
+    """Sample standard deviation of values around their already computed mean"""
+    return math.sqrt(sum((x - mean) ** 2 for x in values) / (len(values) - 1))
+
 def compute_statistics(hop_data):
     
     result = []
-    for hop, data in sorted(hop_data.items()):
+    # Runs can discover hops out of order, so insertion order is not hop order;
+    # sorting the bare int keys is cheaper than sorting (hop, data) tuples
+    for hop in sorted(hop_data):
+        data = hop_data[hop]
         latencies = data['latencies']
         if latencies:
+            count = len(latencies)
+            if np is not None and count >= _NUMPY_MIN_SAMPLES:
+                # Many aggregated runs: let NumPy's vectorized reductions do the work
+                samples = np.asarray(latencies, dtype=np.float64)
+                lowest = float(samples.min())
+                highest = float(samples.max())
+                avg = float(samples.mean())
+                med = float(np.median(samples))
+                std = float(samples.std(ddof=1))
+            else:
+                # Hops hold a handful of samples, so one fused pass beats the
+                # statistics module and separate min/max/sum walks
+                lowest = highest = latencies[0]
+                total = 0.0
+                for value in latencies:
+                    if value < lowest:
+                        lowest = value
+                    elif value > highest:
+                        highest = value
+                    total += value
+                avg = total / count
+                med = _median(latencies)
+                std = _stdev(latencies, avg) if count > 1 else 0
             result.append({
                 'hop': hop,
-                'hosts': list(data['hosts']),
+                'hosts': data['hosts'],
                 'latencies': latencies,  # Include raw data
-                'count': len(latencies),  # Number of measurements
-                'min': min(latencies),
-                'max': max(latencies),
-                'avg': round(sum(latencies) / len(latencies), 3),
-                'med': statistics.median(latencies),
-                'std': round(statistics.stdev(latencies) if len(latencies) > 1 else 0, 3)
+                'count': count,  # Number of measurements
+                'min': lowest,
+                'max': highest,
+                'avg': round(avg, 3),
+                'med': med,
+                'std': round(std, 3)
             })
     return result
 
+def _pick_parser(head):
+    """Choose the output parser from the first few hundred characters of a run"""
+    if "Tracing route to" in head or "Trace complete" in head:
+        return parse_tracert_output
+    return parse_traceroute_output
+
 def process_traceroute_runs(outputs):
     """Process multiple traceroute runs and aggregate data"""
-    aggregated_data = {}
+    # Every run is parsed straight into one accumulator, with no per-run merge
+    aggregated_data = new_hop_data()
     for output in outputs:
-        # Detect format and parse accordingly
-        if "Tracing route to" in output or "Trace complete" in output:
-            # Windows tracert format
-            parsed_data = parse_tracert_output(output)
+        # The tracert banner is on its first lines, so only the head is searched
+        parser = _pick_parser(output[:200])
+        if parser is parse_tracert_output:
             print("Detected Windows tracert format")
         else:
-            # Unix traceroute format
-            parsed_data = parse_traceroute_output(output)
             print("Detected Unix traceroute format")
-            
-        for hop, data in parsed_data.items():
-            if hop not in aggregated_data:
-                aggregated_data[hop] = {'hosts': set(), 'latencies': []}
-            aggregated_data[hop]['hosts'].update(data['hosts'])
-            aggregated_data[hop]['latencies'].extend(data['latencies'])
+        parser(output, aggregated_data)
     return compute_statistics(aggregated_data)
 
 def read_traceroute_files(directory):
     """Read traceroute output files from directory"""
+    # scandir entries carry their file type, so no extra stat per file is needed
+    with os.scandir(directory) as it:
+        entries = sorted(
+            (entry for entry in it if entry.name.endswith('.txt') and entry.is_file()),
+            key=lambda entry: entry.name
+        )
     outputs = []
-    for file in sorted(os.listdir(directory)):
-        if file.endswith('.txt'):
-            with open(os.path.join(directory, file), "r", encoding="utf-8") as f:
-                outputs.append(f.read())
+    for entry in entries:
+        with open(entry.path, "rb") as f:
+            outputs.append(f.read().decode("utf-8"))
     return outputs
 
+def save_results(results, output):
+    """Save computed statistics to <output>.json"""
+    with open(f"{output}.json", "wb") as f:
+        f.write(_dumps(results))
+    print(f"Results saved to {output}.json")
+
+def run_and_save(target, num_runs, run_delay, max_hops, output, output_dir="traceroute_outputs"):
+    """Run traceroute, save the statistics to <output>.json and return them (None if no data)"""
+    hop_data = run_traceroute(target, num_runs, run_delay, max_hops, output_dir)
+    if not hop_data:
+        return None
+    results = compute_statistics(hop_data)
+    save_results(results, output)
+    return results
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(
@@ -255,7 +399,7 @@ def main():
         usage="python traceroute.py [-h] [-n NUM_RUNS] [-d RUN_DELAY] [-m MAX_HOPS] -o OUTPUT [-t TARGET] [--test TEST_DIR] [--outdir OUTPUT_DIR]"
     )
     parser.add_argument("-n", type=int, default=3, metavar="NUM_RUNS", help="Number of times traceroute will run")
-    parser.add_argument("-d", type=int, default=1, metavar="RUN_DELAY", help="Number of seconds to wait between two consecutive runs")
+    parser.add_argument("-d", type=int, default=1, metavar="RUN_DELAY", help="Number of seconds to wait between the starts of two consecutive runs")
     parser.add_argument("-m", type=int, default=30, metavar="MAX_HOPS", help="Max number of hops that traceroute will probe")
     parser.add_argument("-o", type=str, required=True, metavar="OUTPUT", help="Path and name (without extension) of the .json output file")
     parser.add_argument("-t", type=str, metavar="TARGET", help="A target domain name or IP address")
@@ -267,20 +411,13 @@ def main():
     try:
         if args.test:
             traceroute_outputs = read_traceroute_files(args.test)
+            results = process_traceroute_runs(traceroute_outputs)
+            save_results(results, args.o)
         else:
             if not args.t:
                 print("Error: Target must be provided if not using test mode.")
                 return
-            traceroute_outputs = run_traceroute(args.t, args.n, args.d, args.m, args.outdir)
-            if not traceroute_outputs:
-                return
-        
-        results = process_traceroute_runs(traceroute_outputs)
-        
-        with open(f"{args.o}.json", "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=4)
-        
-        print(f"Results saved to {args.o}.json")
+            run_and_save(args.t, args.n, args.d, args.m, args.o, args.outdir)
     except Exception as e:
         print(f"Error encountered: {e}")
 